@@ -8,14 +8,31 @@ const STRETCH_MODES = {
 }
 const TEXT_POSITION = [728,355]; // 文本范围起始位置
 const TEXT_OVER = [2339,800];  // 文本范围右下角位置
+const TEXT_SIZE = [TEXT_OVER[0] - TEXT_POSITION[0], TEXT_OVER[1] - TEXT_POSITION[1]]; // 文本范围尺寸
 const SHADOW_OFFSET = [2, 2]; // 阴影偏移量
 const SHADOW_COLOR = [0, 0, 0]; // 黑色阴影
+const SHADOW_STYLE = `rgb(${SHADOW_COLOR[0]}, ${SHADOW_COLOR[1]}, ${SHADOW_COLOR[2]})`; // 阴影填充样式
+const TEXT_STYLE = "rgb(255, 255, 255)"; // 白色正文
+const HIGHLIGHT_SPLIT_RE = /(【|】)/; // 按【】拆分文本（保留括号本身）
+const CJK_RE = /[\u4e00-\u9fff]/; // 判断字体名称是否包含中文字符
+const CONFIG_FILES = {
+    "chara_meta.yml": "chara_meta",
+    "text_configs.yml": "text_configs",
+    "backgrounds.yml": "backgrounds",
+    "fonts.yml": "fonts"
+}; // 配置文件名与配置项（文本框 ID、本地存储键名）的对应关系
 const OPTION_DEFAULTS = {
     "background": "bg001",
     "chara": "sherri",
     "font": "default",
     "stretch_image": "zoom_x"
 };
+const STRETCH_OPTIONS_HTML = Object.entries(STRETCH_MODES).map(([key, value]) => `
+        <label class="form-check form-check-inline flex-grow-1 my-0">
+            <input class="form-check-input" type="radio" name="stretch_image" value="${key}"${key==OPTION_DEFAULTS.stretch_image ? " checked" : ""}>
+            <span class="form-check-label">${value}</span>
+        </label>
+        `).join(""); // 背景拉伸选项（与配置无关，只生成一次）
 
 // 角色配置字典
 var mahoshojo = {};
@@ -24,7 +41,48 @@ var text_configs = {};
 var backgrounds = {};
 var fonts = {};
 var local_fonts = {};
+// 本地字体显示名称（以字体族名为键）
+var local_font_names = {};
+// 浏览器默认字体（页面样式加载后不会再变化）
+var default_font_family = "";
+// 按需加载的脚本
+var script_loaders = {};
+// 进行中的本地字体请求
+var local_fonts_request = null;
+// 配置文件解析结果缓存
+var yaml_cache = {};
+// 配置加载状态指示器的当前内容
+var config_indicators = {};
+// 预览画布及其绘图上下文
+var preview_canvas = null;
+var preview_ctx = null;
+// 当前显示变体列表的背景
+var shown_background = null;
+// 背景层缓存
+var background_layer = {"image": null, "stretch_mode": null, "canvas": null};
+// 文本换行结果缓存
+var text_lines_cache = {"key": null, "lines": []};
+// 已排队但尚未执行的重绘请求
+var canvas_frame = null;
+// 正文字号（输入框变化时解析一次）
+var text_font_size = 0;
+// 当前选项列表所对应的配置内容
+var applied_configs = null;
 
+function imageCheckHtml(col_class, name, value, src, {title=null, checked=false, background=null, lazy=!checked} = {}) {
+    // 生成背景类图片单选项的 HTML，背景、背景变体和自定义背景共用同一份模板
+    // 画布直接从缩略图绘制，可能在所在标签页隐藏时被绘制的图片不能延迟加载（隐藏的延迟加载图片不会被请求）
+    return `
+        <div class="${col_class}"${background !== null ? ` data-background="${background}"` : ""}>
+            <label class="form-imagecheck mb-2">
+                <input name="${name}" type="radio" value="${value}" class="form-imagecheck-input"${checked ? " checked" : ""}/>
+                <span class="form-imagecheck-figure"${title !== null ? ` title="${title}" data-bs-toggle="tooltip"` : ""}>
+                    <img class="form-imagecheck-image" src="${src}" decoding="async"${lazy ? ' loading="lazy"' : ""}/>
+                </span>
+            </label>
+        </div>
+        `;
+}
 function initBackgrounds() {
     // 渲染背景选择
     let backgrounds_div = $("#backgrounds_div");
@@ -32,123 +90,119 @@ function initBackgrounds() {
     let background_variants_div = $("#background_variants_div");
     background_variants_div.empty();
     background_variants_div.html(`<div class="alert alert-info" role="alert" id="background_variants_alert">当前背景无可用变体</div>`);
+    shown_background = null;
 
+    // 先拼接完整的 HTML，再一次性插入页面
+    let backgrounds_html = "";
+    let variants_html = "";
     for (const [key, value] of Object.entries(backgrounds)) {
-        let bg_html = `
-        <div class="col-6 col-sm-3 col-md-2">
-            <label class="form-imagecheck mb-2">
-                <input name="background" type="radio" value="${key}" class="form-imagecheck-input" onchange="updateCanvas()" onclick="updateCanvas()"${key==OPTION_DEFAULTS.background ? " checked" : ""}/>
-                <span class="form-imagecheck-figure" title="${value.name}" data-bs-toggle="tooltip">
-                    <img class="form-imagecheck-image" src="./assets/backgrounds/${value.file}"/>
-                </span>
-            </label>
-        </div>
-        `;
-        backgrounds_div.append(bg_html);
+        backgrounds_html += imageCheckHtml("col-6 col-sm-3 col-md-2", "background", key, `./assets/backgrounds/${value.file}`, {
+            "title": value.name,
+            "checked": key==OPTION_DEFAULTS.background
+        });
         if (value.variants) {
             for (const [key2, value2] of Object.entries(value.variants)) {
-                let bg_html = `
-                <div class="col-6 col-md-3" data-background="${key}">
-                    <label class="form-imagecheck mb-2">
-                        <input name="background-variant" type="radio" value="${key2}" class="form-imagecheck-input" onchange="updateCanvas()" onclick="updateCanvas()"/>
-                        <span class="form-imagecheck-figure" title="${value2.name}" data-bs-toggle="tooltip">
-                            <img class="form-imagecheck-image" src="./assets/backgrounds/${value2.file}"/>
-                        </span>
-                    </label>
-                </div>
-                `;
-                background_variants_div.append(bg_html);
+                variants_html += imageCheckHtml("col-6 col-md-3", "background-variant", key2, `./assets/backgrounds/${value2.file}`, {
+                    "title": value2.name,
+                    "background": key,
+                    // 默认背景的变体会在背景标签页隐藏时被自动选中并绘制
+                    "lazy": key != OPTION_DEFAULTS.background
+                });
             }
         }
     }
+    backgrounds_div.append(backgrounds_html);
+    background_variants_div.append(variants_html);
 
-    let background_options_div = $("#background_options_div");
-    background_options_div.empty();
-    for (const [key, value] of Object.entries(STRETCH_MODES)) {
-        let option_html = `
-        <label class="form-check form-check-inline flex-grow-1 my-0">
-            <input class="form-check-input" type="radio" name="stretch_image" value="${key}" onchange="updateCanvas()" onclick="updateCanvas()"${key==OPTION_DEFAULTS.stretch_image ? " checked" : ""}>
-            <span class="form-check-label">${value}</span>
-        </label>
-        `;
-        background_options_div.append(option_html);
-    }
+    $("#background_options_div").html(STRETCH_OPTIONS_HTML);
 }
 function initCharacters() {
     // 渲染角色选择
     let characters_div = $("#characters_div");
     characters_div.empty();
+    let characters_html = "";
     for (const [key, value] of Object.entries(mahoshojo)) {
-        let char_html = `
+        characters_html += `
         <div class="col-auto">
             <label class="form-imagecheck mb-2">
-                <input name="character" type="radio" value="${key}" class="form-imagecheck-input" onchange="initEmotions('${key}');updateCanvas()" onclick="initEmotions('${key}');updateCanvas()"${key==OPTION_DEFAULTS.chara ? " checked" : ""}/>
+                <input name="character" type="radio" value="${key}" class="form-imagecheck-input"${key==OPTION_DEFAULTS.chara ? " checked" : ""}/>
                 <span class="form-imagecheck-figure" title="${value.full_name}" data-bs-toggle="tooltip">
                     <span class="avatar avatar-xl" style="background-image: url('./assets/chara/${key}/${key} (1).png')"></span>
                 </span>
             </label>
         </div>
         `;
-        characters_div.append(char_html);
     }
+    characters_div.append(characters_html);
 }
 function initEmotions(character) {
     // 渲染表情选择
     let emotions_div = $("#emotions_div");
     emotions_div.empty();
+    let emotions_html = "";
     for (i=1; i<mahoshojo[character].emotion_count; i++) {
-        let emotion_html = `
+        emotions_html += `
         <div class="col-auto">
             <label class="form-imagecheck mb-2">
-                <input name="emotion" type="radio" value="${i}" class="form-imagecheck-input" onchange="updateCanvas()" onclick="updateCanvas()"/>
+                <input name="emotion" type="radio" value="${i}" class="form-imagecheck-input"/>
                 <span class="form-imagecheck-figure">
-                    <img class="form-imagecheck-image" height="112" src="./assets/chara/${character}/${character} (${i}).png"/>
+                    <img class="form-imagecheck-image" height="112" src="./assets/chara/${character}/${character} (${i}).png" loading="lazy" decoding="async"/>
                 </span>
             </label>
         </div>
         `;
-        emotions_div.append(emotion_html);
     }
+    emotions_div.append(emotions_html);
     $('input[name="emotion"]').first().click();
 }
 function initFonts() {
     let text_fonts_div = $("#text_fonts_div");
-    text_fonts_div.empty();
-
-    if ($("#text_fonts_styles").length) $("#text_fonts_styles").remove();
-    let text_fonts_styles = $('<style></style>').appendTo('head');
-    text_fonts_styles.attr('type', 'text/css');
-    text_fonts_styles.attr('id', 'text_fonts_styles');
 
-    text_fonts_div.append(`
+    let fonts_html = `
     <label class="form-check form-check-inline flex-grow-1 my-0 d-flex align-items-center">
-        <input name="text_font" type="radio" value="default" class="form-check-input" onchange="updateCanvas()" onclick="updateCanvas()" checked/>
+        <input name="text_font" type="radio" value="default" class="form-check-input" checked/>
         <span class="form-check-label ms-2 p-1 fs-2">浏览器默认</span>
     </label>
-    `);
+    `;
+    let fonts_css = "";
 
     for (const [key, value] of Object.entries(fonts)) {
-        let font_html = `
+        fonts_html += `
         <label class="form-check form-check-inline flex-grow-1 my-0 d-flex align-items-center">
-            <input name="text_font" type="radio" value="${key}" class="form-check-input" onchange="updateCanvas()" onclick="updateCanvas()"/>
+            <input name="text_font" type="radio" value="${key}" class="form-check-input"/>
             <span class="form-check-label ms-2 p-1 fs-2" style="font-family: ${key};">${value.name}</span>
         </label>
         `;
-        text_fonts_div.append(font_html);
 
-        text_fonts_styles.append(`@font-face {
+        fonts_css += `@font-face {
             font-family: "${key}";
             src: url("./assets/fonts/${value.file}");
-        }`);
+        }`;
     }
 
-    text_fonts_div.append(`
+    fonts_html += `
     <div class="d-flex align-items-center flex-wrap gap-1" id="custom_text_fonts_div">
         <button class="btn btn-primary" onclick="initLocalFonts()">尝试加载本地字体</button>
     </div>
-    `);
+    `;
+
+    // 字体列表与 @font-face 规则各自一次性写入，避免逐条插入引起多次重排和样式重算
+    if ($("#text_fonts_styles").length) $("#text_fonts_styles").remove();
+    $('<style></style>').attr('type', 'text/css').attr('id', 'text_fonts_styles').text(fonts_css).appendTo('head');
+    text_fonts_div.html(fonts_html);
+    // 本地字体在会话内不会变化，重新生成字体列表时直接复用已获取的结果
+    if (Object.keys(local_fonts).length > 0) showLocalFonts();
+}
+function initLocalFonts() {
+    // 请求完成前重复点击时复用同一次请求，避免重复弹出授权提示并插入多个字体选择框
+    if (!local_fonts_request) {
+        local_fonts_request = loadLocalFonts().finally(function() {
+            local_fonts_request = null;
+        });
+    }
+    return local_fonts_request;
 }
-async function initLocalFonts() {
+async function loadLocalFonts() {
     if (!('queryLocalFonts' in window)) {
         console.log("当前浏览器不支持 queryLocalFonts API");
         $("#custom_text_fonts_div").html(`<div class="alert alert-warning p-2 m-0" role="alert">当前浏览器不支持 <code>queryLocalFonts</code> API</div>`);
@@ -160,24 +214,11 @@ async function initLocalFonts() {
         const fonts = await window.queryLocalFonts();
         if (fonts.length > 0){
             fonts.forEach(font => {
-                if (font.style == "Regular" && font.fullName && /[\u4e00-\u9fff]/.test(font.fullName)) {
+                if (font.style == "Regular" && font.fullName && CJK_RE.test(font.fullName)) {
                     local_fonts[font.family] = font;
                 }
             });
-            if (Object.keys(local_fonts).length > 0) {
-                $("#custom_text_fonts_div").before(`
-                <label class="form-check form-check-inline flex-grow-1 my-0 d-flex align-items-center">
-                    <input name="text_font" type="radio" value="custom" class="form-check-input" onchange="updateCanvas()" onclick="updateCanvas()" for="custom_font"/>
-                    <span class="form-check-label ms-2 w-100">
-                        <select name="custom_font" class="form-select form-control-lg border-0 bg-transparent p-0" onclick="$('input[name=text_font][value=custom]').click()" onchange="updateCanvas()"></select>
-                    </span>
-                </label>
-                `);
-                buildLocalFonts();
-            } else {
-                $("#custom_text_fonts_div").before(`<div class="alert alert-warning p-2 m-0" role="alert">无可用中文字体</div>`);
-            }
-            $("#custom_text_fonts_div").remove();
+            showLocalFonts();
         } else {
             $("#custom_text_fonts_div").html(`<button class="btn btn-primary" onclick="initLocalFonts()">尝试加载本地字体</button>`);
             $("#custom_text_fonts_div").append(`<div class="alert alert-danger p-2 m-0" role="alert">未授权访问本地字体</div>`);
@@ -186,134 +227,254 @@ async function initLocalFonts() {
         console.error("获取字体失败:", err);
     }
 }
+function showLocalFonts() {
+    if (Object.keys(local_fonts).length > 0) {
+        $("#custom_text_fonts_div").before(`
+        <label class="form-check form-check-inline flex-grow-1 my-0 d-flex align-items-center">
+            <input name="text_font" type="radio" value="custom" class="form-check-input" for="custom_font"/>
+            <span class="form-check-label ms-2 w-100">
+                <select name="custom_font" class="form-select form-control-lg border-0 bg-transparent p-0" onclick="$('input[name=text_font][value=custom]').click()"></select>
+            </span>
+        </label>
+        `);
+        buildLocalFonts();
+    } else {
+        $("#custom_text_fonts_div").before(`<div class="alert alert-warning p-2 m-0" role="alert">无可用中文字体</div>`);
+    }
+    $("#custom_text_fonts_div").remove();
+}
+function loadScript(src) {
+    // 按需加载脚本，重复调用时复用同一次加载
+    if (!script_loaders[src]) {
+        script_loaders[src] = new Promise(function(resolve, reject) {
+            let script = document.createElement('script');
+            script.src = src;
+            script.onload = resolve;
+            script.onerror = reject;
+            document.head.appendChild(script);
+        });
+    }
+    return script_loaders[src];
+}
 function buildLocalFonts() {
+    let custom_font_select = $("select[name='custom_font']");
     for (const [key, value] of Object.entries(local_fonts)) {
-        let font = {
-            "family" : value.family,
-            "fullName" : value.fullName.split(" ")[0]
-        }
+        // 显示名称只计算一次，下拉框渲染时直接按字体族名查表
+        local_font_names[key] = value.fullName.split(" ")[0];
         let font_option = $('<option></option>');
         font_option.val(key);
         font_option.attr("style", `font-family: ${key};`);
-        font_option.attr("data-custom-properties", JSON.stringify(font));
-        font_option.text(`${font.fullName}${(font.family!=font.fullName)?" ("+font.family+")":""}`);
-        $("select[name='custom_font']").append(font_option);
+        font_option.text(`${local_font_names[key]}${(key!=local_font_names[key])?" ("+key+")":""}`);
+        custom_font_select.append(font_option);
     }
     
-    window.TomSelect && (new TomSelect(el = $("select[name='custom_font']")[0], {
-        copyClassesToDropdown: false,
-        dropdownParent: 'body',
-        controlInput: '<input>',
-        onDropdownOpen: function () {
-            $('input[name=text_font][value=custom]').click();
-        },
-        onInitialize:function(){
-            $('.ts-control').addClass('p-0');
-        },
-        render:{
-            item:function(data,escape){
-                let font = JSON.parse(data.customProperties);
-                return `<div style="font-family:${font.family}">${escape(font.fullName)}</div>`;
+    // 下拉搜索组件只在用到本地字体时才加载
+    loadScript("./js/tom-select.base.min.js").then(function() {
+        new TomSelect(custom_font_select[0], {
+            copyClassesToDropdown: false,
+            dropdownParent: 'body',
+            controlInput: '<input>',
+            onDropdownOpen: function () {
+                $('input[name=text_font][value=custom]').click();
             },
-            option:function(data,escape){
-                let font = JSON.parse(data.customProperties);
-                return `<div><span style="font-family:${font.family}">${escape(font.fullName)}</span> (${escape(font.family)})</div>`;
+            onInitialize:function(){
+                $('.ts-control').addClass('p-0');
             },
-            no_results:function(data,escape){
-                return '<div class="no-results">没有找到对应字体</div>';
+            render:{
+                item:function(data,escape){
+                    return `<div style="font-family:${data.value}">${escape(local_font_names[data.value])}</div>`;
+                },
+                option:function(data,escape){
+                    return `<div><span style="font-family:${data.value}">${escape(local_font_names[data.value])}</span> (${escape(data.value)})</div>`;
+                },
+                no_results:function(data,escape){
+                    return '<div class="no-results">没有找到对应字体</div>';
+                },
             },
-        },
-    }));
+        });
+    }).catch(function(e) {
+        console.warn("加载 tom-select 失败，使用原生下拉框：", e);
+    });
+}
+
+function splitTextLines(ctx, text, maxWidth, maxLines) {
+    // 文本与字体均未变化时复用上次的换行结果
+    const key = `${ctx.font}\n${maxLines}\n${text}`;
+    if (text_lines_cache.key === key) return text_lines_cache.lines;
+    let lines = [];
+
+    // 根据空格或换行进行单词换行，若无空格则按字符换行（适合中文）
+    // 先按换行分段处理，每个段落内部再按单词或字符换行，段落之间保留空行
+    const paragraphs = text.split('\n');
+    for (let p = 0; p < paragraphs.length; p++) {
+        const para = paragraphs[p];
+
+        if (para.indexOf(' ') !== -1) {
+            const words = para.split(' ');
+            let line = '';
+            for (let n = 0; n < words.length; n++) {
+                const word = words[n];
+                const testLine = line ? (line + ' ' + word) : word;
+                const testWidth = ctx.measureText(testLine).width;
+                if (testWidth > maxWidth && line) {
+                    lines.push(line);
+                    line = word;
+                    if (lines.length >= maxLines) break;
+                } else {
+                    line = testLine;
+                }
+            }
+            if (lines.length < maxLines && line) lines.push(line);
+        } else {
+            let line = '';
+            for (let i = 0; i < para.length; i++) {
+                const ch = para[i];
+                const testLine = line + ch;
+                const testWidth = ctx.measureText(testLine).width;
+                if (testWidth > maxWidth && line) {
+                    lines.push(line);
+                    line = ch;
+                    if (lines.length >= maxLines) break;
+                } else {
+                    line = testLine;
+                }
+            }
+            if (lines.length < maxLines && line) lines.push(line);
+        }
+
+        if (lines.length >= maxLines) break;
+    }
 
+    text_lines_cache = {"key": key, "lines": lines};
+    return lines;
 }
+function getBackgroundLayer(background, stretch_mode, width, height) {
+    // 背景图与拉伸方式均未变化时复用上次合成的背景层（背景图 + UI）
+    if (background_layer.image === background && background_layer.stretch_mode === stretch_mode
+        && background_layer.canvas.width == width && background_layer.canvas.height == height) {
+        return background_layer.canvas;
+    }
+    let layer = background_layer.canvas ?? document.createElement('canvas');
+    layer.width = width;
+    layer.height = height;
+    background_layer.canvas = layer;
+    let ctx = layer.getContext("2d");
 
+    let dest=[0,0];
+    let size=[0,0];
+    let scale=1;
+    switch (stretch_mode) {
+        case "stretch_x":
+            // 使宽度填满画布，垂直居中
+            size[0] = width;
+            size[1] = background.naturalHeight;
+            dest[1] = Math.round((height - size[1]) / 2);
+            break;
+        case "stretch_y":
+            // 使高度填满画布，水平居中
+            size[0] = background.naturalWidth;
+            size[1] = height;
+            dest[0] = Math.round((width - size[0]) / 2);
+            break;
+        case "zoom_x": {
+            // 缩放使宽度填满画布并保持纵横比，垂直居中
+            scale = width / background.naturalWidth;
+            size[0] = width;
+            size[1] = Math.round(background.naturalHeight * scale);
+            dest[1] = Math.round((height - size[1]) / 2);
+            break;
+        }
+        case "zoom_y": {
+            // 缩放使高度填满画布并保持纵横比，水平居中
+            scale = height / background.naturalHeight;
+            size[0] = Math.round(background.naturalWidth * scale);
+            size[1] = height;
+            dest[0] = Math.round((width - size[0]) / 2);
+            break;
+        }
+        case "original":
+            // 原始尺寸，居中
+            size[0] = background.naturalWidth;
+            size[1] = background.naturalHeight;
+            dest[0] = Math.round((width - size[0]) / 2);
+            dest[1] = Math.round((height - size[1]) / 2);
+            break;
+        case "stretch":
+        default:
+            size[0] = width;
+            size[1] = height;
+            break;
+    }
+    ctx.drawImage(background, dest[0], dest[1], size[0], size[1]);
+    let ui = $('#custom_background_ui')[0];
+    ctx.drawImage(ui, 0, 0, width, height);
+
+    // 图片尚未加载完成时不缓存，待加载后重新合成
+    background_layer.image = (background.complete && ui.complete) ? background : null;
+    background_layer.stretch_mode = stretch_mode;
+    return layer;
+}
 function updateCanvas() {
-    let canvas = $('#canvas')[0];
-    let ctx = canvas.getContext("2d");
-    let backgroundId = $('input[name="background"]:checked').val();
+    // 同一帧内的多次更新请求（如连续输入、一次点击触发的多个事件）合并为一次重绘
+    if (canvas_frame === null) {
+        canvas_frame = requestAnimationFrame(renderCanvas);
+    }
+}
+function flushCanvas() {
+    // 立即执行尚未完成的重绘，保证读取画布时内容是最新的
+    if (canvas_frame !== null) {
+        cancelAnimationFrame(canvas_frame);
+        renderCanvas();
+    }
+}
+function renderCanvas() {
+    canvas_frame = null;
+    let canvas = preview_canvas;
+    let ctx = preview_ctx;
+    let background_input = $('input[name="background"]:checked');
+    let backgroundId = background_input.val();
 
     // 清空画布
     ctx.clearRect(0, 0, canvas.width, canvas.height);
     
     if (backgroundId) {
-        $('[data-background]').hide();
-        $(`[data-background="${backgroundId}"]`).show();
-        let background = $('input[name="background"]:checked').next().children()[0];
+        let background = background_input.next().children()[0];
+        let background_variants = backgrounds[backgroundId] ? backgrounds[backgroundId].variants : undefined;
+        let variant_input = $('input[name="background-variant"]:checked');
+        if (backgroundId != shown_background) {
+            // 仅在切换背景时更新变体列表的显示状态，避免每次重绘都触发页面重排
+            shown_background = backgroundId;
+            $('[data-background]').hide();
+            $(`[data-background="${backgroundId}"]`).show();
+            $('#background_variants_div').parent().toggle(backgroundId != "custom");
+            $('#background_variants_alert').toggle(!background_variants);
+        }
         if (backgroundId != "custom") {
-            $('#background_variants_div').parent().show();
-            if (backgrounds[backgroundId] && backgrounds[backgroundId].variants) {
-                $('#background_variants_alert').hide();
-                if (Object.keys(backgrounds[backgroundId].variants).includes($('input[name="background-variant"]:checked').val())) {
-                    background = $('input[name="background-variant"]:checked').next().children()[0];
+            if (background_variants) {
+                if (background_variants.hasOwnProperty(variant_input.val())) {
+                    background = variant_input.next().children()[0];
                 } else {
                     $(`[data-background="${backgroundId}"] input[name="background-variant"]`).first().click();
                 }
             } else {
-                $('#background_variants_alert').show();
-                if ($('input[name="background-variant"]:checked').val()) $('input[name="background-variant"]:checked')[0].checked = false;
-            }
-        } else {
-            $('#background_variants_div').parent().hide();
-        }
-        let dest=[0,0];
-        let size=[0,0];
-        let scale=1;
-        switch ($('input[name="stretch_image"]:checked').val()) {
-            case "stretch_x":
-                // 使宽度填满画布，垂直居中
-                size[0] = canvas.width;
-                size[1] = background.naturalHeight;
-                dest[1] = Math.round((canvas.height - size[1]) / 2);
-                break;
-            case "stretch_y":
-                // 使高度填满画布，水平居中
-                size[0] = background.naturalWidth;
-                size[1] = canvas.height;
-                dest[0] = Math.round((canvas.width - size[0]) / 2);
-                break;
-            case "zoom_x": {
-                // 缩放使宽度填满画布并保持纵横比，垂直居中
-                scale = canvas.width / background.naturalWidth;
-                size[0] = canvas.width;
-                size[1] = Math.round(background.naturalHeight * scale);
-                dest[1] = Math.round((canvas.height - size[1]) / 2);
-                break;
-            }
-            case "zoom_y": {
-                // 缩放使高度填满画布并保持纵横比，水平居中
-                scale = canvas.height / background.naturalHeight;
-                size[0] = Math.round(background.naturalWidth * scale);
-                size[1] = canvas.height;
-                dest[0] = Math.round((canvas.width - size[0]) / 2);
-                break;
+                if (variant_input.length) variant_input[0].checked = false;
             }
-            case "original":
-                // 原始尺寸，居中
-                size[0] = background.naturalWidth;
-                size[1] = background.naturalHeight;
-                dest[0] = Math.round((canvas.width - size[0]) / 2);
-                dest[1] = Math.round((canvas.height - size[1]) / 2);
-                break;
-            case "stretch":
-            default:
-                size[0] = canvas.width;
-                size[1] = canvas.height;
-                break;
         }
-        ctx.drawImage(background, dest[0], dest[1], size[0], size[1]);
-        ctx.drawImage($('#custom_background_ui')[0], 0, 0, canvas.width, canvas.height);
+        ctx.drawImage(getBackgroundLayer(background, $('input[name="stretch_image"]:checked').val(), canvas.width, canvas.height), 0, 0);
     }
     
     let character = $('input[name="character"]:checked').val();
     if (character) {
-        if ($('input[name="emotion"]:checked')) ctx.drawImage($('input[name="emotion"]:checked').next().children()[0], 0, 134);
+        let emotion_input = $('input[name="emotion"]:checked');
+        let character_font = mahoshojo[character].font;
+        if (emotion_input.length) ctx.drawImage(emotion_input.next().children()[0], 0, 134);
         for (const [key, value] of Object.entries(text_configs[character])) {
-            ctx.font = `${value.font_size}px ${mahoshojo[character].font}`;
+            ctx.font = `${value.font_size}px ${character_font}`;
 
-            ctx.fillStyle = `rgb(${SHADOW_COLOR[0]}, ${SHADOW_COLOR[1]}, ${SHADOW_COLOR[2]})`;
+            ctx.fillStyle = SHADOW_STYLE;
             ctx.fillText(value.text, value.position[0] + SHADOW_OFFSET[0], value.font_size + value.position[1] + SHADOW_OFFSET[1]);
 
-            ctx.fillStyle = `rgb(${value.font_color[0]}, ${value.font_color[1]}, ${value.font_color[2]})`;
+            ctx.fillStyle = value.fill_style;
             ctx.fillText(value.text, value.position[0], value.font_size + value.position[1]);
         }
     }
@@ -322,7 +483,8 @@ function updateCanvas() {
     let text_font = $('input[name="text_font"]:checked').val();
     switch (text_font) {
         case "default":
-            text_font = window.getComputedStyle(document.body)['fontFamily'];
+            if (!default_font_family) default_font_family = window.getComputedStyle(document.body)['fontFamily'];
+            text_font = default_font_family;
             break;
         case "custom":
             text_font = $('select[name="custom_font"]').val();
@@ -330,112 +492,100 @@ function updateCanvas() {
         default:
             break;
     }
-    let text_font_size = parseInt($('input[name="text_font_size"]').val());
     let text_highlight = $('input[name="text_highlight"]:checked').val();
     if (text) {
         ctx.font = `${text_font_size}px ${text_font}`;
         
         // 自动换行绘制
-        const maxWidth = TEXT_OVER[0] - TEXT_POSITION[0];
-        const maxHeight = TEXT_OVER[1] - TEXT_POSITION[1];
+        const maxWidth = TEXT_SIZE[0];
+        const maxHeight = TEXT_SIZE[1];
         const lineHeight = Math.floor(text_font_size * 1.2);
         const maxLines = Math.floor(maxHeight / lineHeight) || 1;
-        let lines = [];
+        const lines = splitTextLines(ctx, text, maxWidth, maxLines);
 
-        // 根据空格或换行进行单词换行，若无空格则按字符换行（适合中文）
-        // 先按换行分段处理，每个段落内部再按单词或字符换行，段落之间保留空行
-        const paragraphs = text.split('\n');
-        for (let p = 0; p < paragraphs.length; p++) {
-            const para = paragraphs[p];
-
-            if (para.indexOf(' ') !== -1) {
-                const words = para.split(' ');
-                let line = '';
-                for (let n = 0; n < words.length; n++) {
-                    const word = words[n];
-                    const testLine = line ? (line + ' ' + word) : word;
-                    const testWidth = ctx.measureText(testLine).width;
-                    if (testWidth > maxWidth && line) {
-                        lines.push(line);
-                        line = word;
-                        if (lines.length >= maxLines) break;
-                    } else {
-                        line = testLine;
-                    }
-                }
-                if (lines.length < maxLines && line) lines.push(line);
-            } else {
-                let line = '';
-                for (let i = 0; i < para.length; i++) {
-                    const ch = para[i];
-                    const testLine = line + ch;
-                    const testWidth = ctx.measureText(testLine).width;
-                    if (testWidth > maxWidth && line) {
-                        lines.push(line);
-                        line = ch;
-                        if (lines.length >= maxLines) break;
-                    } else {
-                        line = testLine;
-                    }
-                }
-                if (lines.length < maxLines && line) lines.push(line);
-            }
-
-            if (lines.length >= maxLines) break;
-        }
-
-        // 绘制每一行（先阴影再主体）
+        // 绘制每一行（先阴影再主体），启用突出显示时在同一遍中切换【文本】部分的颜色
+        // 未选中角色、角色没有文字配置或缺少颜色时不启用突出显示
+        const highlight_style = text_highlight ? (text_configs[character]?.[0]?.fill_style ?? null) : null;
+        let isHighlight = false;
         for (let i = 0; i < Math.min(lines.length, maxLines); i++) {
             const line = lines[i];
             const x = TEXT_POSITION[0];
             // 保持与原来单行位置一致：首行基线为 text_font_size + TEXT_POSITION[1]
             const y = text_font_size + TEXT_POSITION[1] + i * lineHeight;
 
-            ctx.fillStyle = `rgb(${SHADOW_COLOR[0]}, ${SHADOW_COLOR[1]}, ${SHADOW_COLOR[2]})`;
+            ctx.fillStyle = SHADOW_STYLE;
             ctx.fillText(line, x + SHADOW_OFFSET[0], y + SHADOW_OFFSET[1]);
 
-            ctx.fillStyle = `rgb(255, 255, 255)`;
-            ctx.fillText(line, x, y);
-        }
-
-        if (text_highlight) {
-            // 突出显示【文本】部分
-            let isHighlight = false;
-            for (let i = 0; i < Math.min(lines.length, maxLines); i++) {
-                const line = lines[i];
-                const x = TEXT_POSITION[0];
-                // 保持与原来单行位置一致：首行基线为 text_font_size + TEXT_POSITION[1]
-                const y = text_font_size + TEXT_POSITION[1] + i * lineHeight;
+            if (!highlight_style || (!isHighlight && line.indexOf('【') === -1)) {
+                // 整行均为普通文本（无可用的突出显示颜色时，【】部分也按普通文本绘制）
+                ctx.fillStyle = TEXT_STYLE;
+                ctx.fillText(line, x, y);
+                continue;
+            }
 
-                // 检查并切换绘制颜色
-                const parts = line.split(/(【|】)/g);
-                let currentX = x;
+            // 检查并切换绘制颜色
+            const parts = line.split(HIGHLIGHT_SPLIT_RE);
+            let currentX = x;
 
-                parts.forEach(part => {
-                    if (part === '【') {
-                        isHighlight = true;
-                    }
-                    if (isHighlight) {
-                        ctx.fillStyle = `rgb(${text_configs[character][0]['font_color'][0]},${text_configs[character][0]['font_color'][1]},${text_configs[character][0]['font_color'][2]})`
-                        ctx.fillText(part, currentX, y); // 绘制高亮显示的文本
-                        currentX += ctx.measureText(part).width; // 更新当前X坐标
-                    } else {
-                        currentX += ctx.measureText(part).width; // 更新当前X坐标
-                    }
-                    if (part === '】') {
-                        isHighlight = false;
-                    }
-                });
-            }
+            parts.forEach(part => {
+                if (part === '【') {
+                    isHighlight = true;
+                }
+                ctx.fillStyle = isHighlight ? highlight_style : TEXT_STYLE;
+                ctx.fillText(part, currentX, y);
+                currentX += ctx.measureText(part).width; // 更新当前X坐标
+                if (part === '】') {
+                    isHighlight = false;
+                }
+            });
         }
     }
 }
 function downloadImage() {
-    let canvas = $('#canvas')[0];
-    canvas.toBlob(function(blob) {
+    flushCanvas();
+    preview_canvas.toBlob(function(blob) {
         saveAs(blob, `魔裁文本框表情-${Date.now()}.png`);
     });
 }
+function normalizeConfig(name, data) {
+    // 派生字段只在解析时生成一次，之后各处只读使用
+    if (!data) return data;
+    switch (name) {
+        case "mahoshojo":
+            for (const [key, value] of Object.entries(data)) {
+                value.font = value.font.replace(".ttf", "");
+            }
+            break;
+        case "text_configs":
+            // 预先生成各段文字的填充颜色，避免每次绘制时重复拼接
+            // 与绘制时的遍历方式保持一致，格式不正确的条目直接跳过，不影响其他角色加载
+            for (const value of Object.values(data)) {
+                for (const text of Object.values(value ?? {})) {
+                    if (!text?.font_color) continue;
+                    text.fill_style = `rgb(${text.font_color[0]}, ${text.font_color[1]}, ${text.font_color[2]})`;
+                }
+            }
+            break;
+        default:
+            break;
+    }
+    return data;
+}
+function loadConfigYaml(name, yaml) {
+    // 配置文本未变化时直接复用上次的解析结果
+    if (!yaml) return {};
+    if (!yaml_cache[name] || yaml_cache[name].yaml !== yaml) {
+        yaml_cache[name] = {"yaml": yaml, "data": normalizeConfig(name, jsyaml.load(yaml)[name])};
+    }
+    return yaml_cache[name].data;
+}
+function setConfigIndicator(name, count, direct) {
+    // 加载状态未变化时不重写指示器
+    let html = count > 0 ? `<span class="text-success">已加载 ${count} 条${direct ? "（YAML 直读）" : ""}</span>` : '<span class="text-danger">未加载</span>';
+    if (config_indicators[name] === html) return;
+    config_indicators[name] = html;
+    $(`#${name}-indicator`).html(html);
+}
 function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", backgrounds_yaml="", fonts_yaml="") {
     if (direct) {
         if (chara_meta_yaml == "" || text_configs_yaml == "" || backgrounds_yaml == "" || fonts_yaml == "") {
@@ -444,25 +594,21 @@ function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", ba
                     chara_meta_yaml = data;
                 }).fail(function(e) {
                     console.warn("读取 chara_meta.yml 失败：", e);
-                    checkConfigs(false);
                 }),
                 $.get("./config/text_configs.yml", function(data) {
                     text_configs_yaml = data;
                 }).fail(function(e) {
                     console.warn("读取 text_configs.yml 失败：", e);
-                    checkConfigs(false);
                 }),
                 $.get("./config/backgrounds.yml", function(data) {
                     backgrounds_yaml = data;
                 }).fail(function(e) {
                     console.warn("读取 backgrounds.yml 失败：", e);
-                    checkConfigs(false);
                 }),
                 $.get("./config/fonts.yml", function(data) {
                     fonts_yaml = data;
                 }).fail(function(e) {
                     console.warn("读取 fonts.yml 失败：", e);
-                    checkConfigs(false);
                 })
             ).done(function() {
                 if (chara_meta_yaml == "" || text_configs_yaml == "" || backgrounds_yaml == "" || fonts_yaml == "") {
@@ -471,7 +617,13 @@ function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", ba
                 } else {
                     checkConfigs(true, chara_meta_yaml, text_configs_yaml, backgrounds_yaml, fonts_yaml);
                 }
+            }).fail(function() {
+                // 任一文件读取失败时只回退一次，避免重复初始化
+                console.info("未能通过 YAML 直读加载配置，尝试从本地存储加载。");
+                checkConfigs(false);
             });
+            // 等待读取结果，不先以空配置渲染一次
+            return;
         }
     } else {
         chara_meta_yaml = localStorage.getItem("manosaba_chara_meta") ?? "";
@@ -480,45 +632,31 @@ function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", ba
         fonts_yaml = localStorage.getItem("manosaba_fonts") ?? "";
     }
 
-    mahoshojo = chara_meta_yaml ? jsyaml.load(chara_meta_yaml)['mahoshojo'] : {};
-    text_configs = text_configs_yaml ? jsyaml.load(text_configs_yaml)['text_configs'] : {};
-    backgrounds = backgrounds_yaml ? jsyaml.load(backgrounds_yaml)['backgrounds'] : {};
-    fonts = fonts_yaml ? jsyaml.load(fonts_yaml)['fonts'] : {};
+    mahoshojo = loadConfigYaml('mahoshojo', chara_meta_yaml);
+    text_configs = loadConfigYaml('text_configs', text_configs_yaml);
+    backgrounds = loadConfigYaml('backgrounds', backgrounds_yaml);
+    fonts = loadConfigYaml('fonts', fonts_yaml);
     $('#chara_meta').val(chara_meta_yaml);
     $('#text_configs').val(text_configs_yaml);
     $('#backgrounds').val(backgrounds_yaml);
     $('#fonts').val(fonts_yaml);
-    if (Object.keys(mahoshojo).length > 0) {
-        for (const [key, value] of Object.entries(mahoshojo)) {
-            value.font = value.font.replace(".ttf", "");
-        }
-        $('#chara_meta-indicator').html(`<span class="text-success">已加载 ${Object.keys(mahoshojo).length} 条${direct ? "（YAML 直读）" : ""}</span>`);
-    } else {
-        $('#chara_meta-indicator').html('<span class="text-danger">未加载</span>');
-    }
-    if (Object.keys(text_configs).length > 0) {
-        $('#text_configs-indicator').html(`<span class="text-success">已加载 ${Object.keys(text_configs).length} 条${direct ? "（YAML 直读）" : ""}</span>`);
-    } else {
-        $('#text_configs-indicator').html('<span class="text-danger">未加载</span>');
-    }
-    if (Object.keys(backgrounds).length > 0) {
-        $('#backgrounds-indicator').html(`<span class="text-success">已加载 ${Object.keys(backgrounds).length} 条${direct ? "（YAML 直读）" : ""}</span>`);
-    } else {
-        $('#backgrounds-indicator').html('<span class="text-danger">未加载</span>');
-    }
-    if (Object.keys(fonts).length > 0) {
-        $('#fonts-indicator').html(`<span class="text-success">已加载 ${Object.keys(fonts).length} 条${direct ? "（YAML 直读）" : ""}</span>`);
-    } else {
-        $('#fonts-indicator').html('<span class="text-danger">未加载</span>');
-    }
+    setConfigIndicator('chara_meta', Object.keys(mahoshojo).length, direct);
+    setConfigIndicator('text_configs', Object.keys(text_configs).length, direct);
+    setConfigIndicator('backgrounds', Object.keys(backgrounds).length, direct);
+    setConfigIndicator('fonts', Object.keys(fonts).length, direct);
     
     $('ul.nav.nav-tabs.card-header-tabs li, ul.nav.nav-tabs.card-header-tabs li > a').removeClass("active");
     if (Object.keys(mahoshojo).length > 0 && Object.keys(text_configs).length > 0) {
-        initBackgrounds();
-        initCharacters();
-        initEmotions(OPTION_DEFAULTS.chara);
-        initFonts();
-        $('[data-bs-toggle="tooltip"]').tooltip();
+        // 配置内容与当前已渲染的完全相同时（如重复上传同一文件），保留现有选项列表及其选中状态
+        let configs_key = [chara_meta_yaml, text_configs_yaml, backgrounds_yaml, fonts_yaml].join("\0");
+        if (configs_key !== applied_configs) {
+            applied_configs = configs_key;
+            initBackgrounds();
+            initCharacters();
+            initEmotions(OPTION_DEFAULTS.chara);
+            initFonts();
+            $('[data-bs-toggle="tooltip"]').tooltip();
+        }
         $('ul.nav.nav-tabs.card-header-tabs li').removeAttr("hidden");
         $('ul.nav.nav-tabs.card-header-tabs li:nth-child(2), ul.nav.nav-tabs.card-header-tabs li:nth-child(2) > a').addClass("active");
         $('.tab-pane').removeClass("active show");
@@ -528,6 +666,7 @@ function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", ba
             $('#configs_upload_div').html("已经通过 YAML 文件直接加载配置，无需上传。");
         }
     } else {
+        applied_configs = null;
         $('ul.nav.nav-tabs.card-header-tabs li').attr("hidden", true);
         $('ul.nav.nav-tabs.card-header-tabs li:last-child').removeAttr("hidden");
         $('ul.nav.nav-tabs.card-header-tabs li:last-child, ul.nav.nav-tabs.card-header-tabs li:last-child > a').addClass("active");
@@ -537,76 +676,82 @@ function checkConfigs(direct=false, chara_meta_yaml="", text_configs_yaml="", ba
     }
 }
 function resetConfigs() {
-    localStorage.removeItem("manosaba_chara_meta");
-    localStorage.removeItem("manosaba_text_configs");
-    localStorage.removeItem("manosaba_backgrounds");
-    localStorage.removeItem("manosaba_fonts");
+    for (const config of Object.values(CONFIG_FILES)) {
+        localStorage.removeItem(`manosaba_${config}`);
+    }
     checkConfigs();
 }
 function init() {
+    preview_canvas = $('#canvas')[0];
+    preview_ctx = preview_canvas.getContext("2d");
+    text_font_size = parseInt($('input[name="text_font_size"]').val());
     checkConfigs(true);
 }
 $(document).ready(function() {
     init();
+    // 动态生成的选项统一通过事件委托处理，无需为每个元素单独绑定
+    $(document).on('change', 'input[name="character"]', function() {
+        initEmotions(this.value);
+        updateCanvas();
+    });
+    $(document).on('change', 'input[name="background"], input[name="background-variant"], input[name="stretch_image"], input[name="emotion"], input[name="text_font"], select[name="custom_font"]', function() {
+        updateCanvas();
+    });
+    // 缩略图按需加载，当前选中的图片加载完成时需要重新绘制（load 事件不冒泡，在捕获阶段监听）
+    document.addEventListener('load', function(event) {
+        if ($(event.target).is('.form-imagecheck-image') && $(event.target).closest('label').children('input').is(':checked')) {
+            updateCanvas();
+        }
+    }, true);
+    // 字体文件加载完成后字宽会变化，需要重新换行并绘制
+    document.fonts.addEventListener('loadingdone', function() {
+        text_lines_cache = {"key": null, "lines": []};
+        updateCanvas();
+    });
     $('input[name="configs"]').on('change', function(event) {
         const files = event.target.files;
+        let pending = files.length;
         for (let i = 0; i < files.length; i++) {
             const file = files[i];
             const reader = new FileReader();
             reader.onload = function(e) {
                 const content = e.target.result;
+                if (!CONFIG_FILES.hasOwnProperty(file.name)) {
+                    console.info("已跳过未知的配置文件：" + file.name);
+                    return;
+                }
                 try {
-                    const data = jsyaml.load(content);
-                    if (file.name === "chara_meta.yml") {
-                        $('#chara_meta').val(content);
-                        localStorage.setItem("manosaba_chara_meta", content);
-                    } else if (file.name === "text_configs.yml") {
-                        $('#text_configs').val(content);
-                        localStorage.setItem("manosaba_text_configs", content);
-                    } else if (file.name === "backgrounds.yml") {
-                        $('#backgrounds').val(content);
-                        localStorage.setItem("manosaba_backgrounds", content);
-                    } else if (file.name === "fonts.yml") {
-                        $('#fonts').val(content);
-                        localStorage.setItem("manosaba_fonts", content);
-                    } else {
-                        console.info("已跳过未知的配置文件：" + file.name);
-                    }
+                    // 仅校验语法，解析结果在 checkConfigs 中统一生成
+                    jsyaml.load(content);
+                    const config = CONFIG_FILES[file.name];
+                    $(`#${config}`).val(content);
+                    localStorage.setItem(`manosaba_${config}`, content);
                 } catch (error) {
                     console.warn("解析 " + file.name + " 失败：" + error);
                 }
-                checkConfigs();
+            };
+            reader.onloadend = function() {
+                // 所有文件读取完毕后只重新加载一次配置
+                if (--pending == 0) checkConfigs();
             };
             reader.readAsText(file);
         }
     });
     $('input[name="custom_backgrounds"]').on('change', function(event) {
-        const files = event.target.files;
-        for (let i = 0; i < files.length; i++) {
-            const file = files[i];
-            const reader = new FileReader();
-            reader.onload = function(e) {
-                const content = e.target.result;
-                try {
-                    $("#custom_backgrounds_div").append(`
-                    <div class="col-6 col-md-3">
-                        <label class="form-imagecheck mb-2">
-                            <input name="background" type="radio" value="custom" class="form-imagecheck-input" onchange="updateCanvas()" onclick="updateCanvas()"/>
-                            <span class="form-imagecheck-figure">
-                                <img class="form-imagecheck-image" src="${content}"/>
-                            </span>
-                        </label>
-                    </div>
-                    `);
-                } catch (error) {
-                    console.warn("解析 " + file.name + " 失败：" + error);
-                }
-            };
-            reader.readAsDataURL(file);
+        // 直接引用文件对象生成 URL，无需将整张图片读入内存并编码为 Base64 字符串
+        let custom_backgrounds_html = "";
+        for (const file of event.target.files) {
+            custom_backgrounds_html += imageCheckHtml("col-6 col-md-3", "background", "custom", URL.createObjectURL(file));
         }
+        $("#custom_backgrounds_div").append(custom_backgrounds_html);
     });
-    $("input[name='text_font_size']").on("input change", function(){
-        $("input[name='text_font_size']").val($(this).val());
+    $("input[name='text_font_size']").on("input", function(){
+        let size = parseInt($(this).val());
+        // 输入中途的空值或非法值不覆盖上一次的有效字号
+        if (isNaN(size)) return;
+        $("input[name='text_font_size']").not(this).val(size);
+        // 以滑块的值为准，浏览器会将其限制在 min/max 范围内
+        text_font_size = parseInt($("input[name='text_font_size'][type='range']").val());
         updateCanvas();
     });
 });